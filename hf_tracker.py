@@ -3,17 +3,49 @@ Hugging Face Model Tracker
 Tracks models from specific HF users and notifies via Telegram on updates.
 """
 
+import hashlib
+import html
 import json
+import operator
+import os
+import sys
 import time
+import signal
+import sqlite3
 import logging
 import asyncio
-import queue
-import threading
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
 
-from huggingface_hub import HfApi, ModelInfo
+# Bound huggingface_hub's HTTP waits so a stuck request can't hang a whole
+# cycle; must be set before the huggingface_hub import reads them
+os.environ.setdefault("HF_HUB_ETAG_TIMEOUT", "10")
+os.environ.setdefault("HF_HUB_DOWNLOAD_TIMEOUT", "30")
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from huggingface_hub import HfApi, ModelInfo, configure_http_backend
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def _make_session() -> requests.Session:
+    """Build a keep-alive session with a pool big enough for parallel polling."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Route huggingface_hub's own requests through the same pooled-session factory
+configure_http_backend(backend_factory=_make_session)
 from telegram import Bot
 from telegram.error import TelegramError
 
@@ -24,6 +56,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Project all ModelInfo fields we store in one C-level call instead of a
+# chain of per-field getattr/hasattr lookups
+_MI_GET = operator.attrgetter(
+    "id", "author", "created_at", "last_modified", "sha", "tags", "downloads"
+)
+
+# Notification templates, built once at import instead of re-assembled per update
+_TPL_NEW = (
+    "🆕 <b>New Model Detected!</b>\n\n"
+    "👤 User: <b>{user}</b>\n"
+    "📦 Model: <b>{model_id}</b>\n"
+    "🏷️ Tags: {tags}\n"
+    "📥 Downloads: {downloads:,}\n"
+    "📅 Last Modified: {last_modified}\n"
+    "🔗 <a href='{url}'>View on Hugging Face</a>"
+)
+_TPL_UPDATED = (
+    "🔄 <b>Model Updated!</b>\n\n"
+    "👤 User: <b>{user}</b>\n"
+    "📦 Model: <b>{model_id}</b>\n"
+    "📅 Last Modified: {last_modified}\n"
+    "🔗 <a href='{url}'>View on Hugging Face</a>"
+)
+
 
 class HFTracker:
     """Main tracker class for monitoring Hugging Face models."""
@@ -38,9 +94,38 @@ class HFTracker:
         self.check_interval = self.config.get("check_interval_minutes", 60) * 60  # Convert to seconds
         self.state_file = Path(self.config.get("state_file", "tracker_state.json"))
         
-        # Initialize APIs
-        self.hf_api = HfApi()
+        # Initialize APIs. An authenticated token lifts the Hub's anonymous
+        # rate limits, which matters once users are polled in parallel.
+        self.hf_token = os.environ.get("HF_TOKEN")
+        if not self.hf_token:
+            logger.warning(
+                "HF_TOKEN environment variable not set. Requests will be "
+                "unauthenticated and subject to much stricter rate limits."
+            )
+        self.hf_api = HfApi(token=self.hf_token, library_name="hf-tracker")
+        # Pooled keep-alive session for the direct listing calls, so each
+        # poll reuses TCP+TLS connections instead of handshaking per request
+        self._session = _make_session()
         self.telegram_bot = None
+
+        # Short-lived model_info cache so bursty polls/retries don't repeat
+        # identical requests (and trip HTTP 429s) within the TTL window
+        self._minfo_cache: Dict[str, tuple] = {}
+        self._minfo_cache_ttl = 300  # seconds
+
+        # Timestamp-string intern table: bulk-uploaded model families share
+        # identical created_at/last_modified values, so dedupe the ISO strings
+        # instead of keeping one copy per model
+        self._ts_intern: Dict[str, str] = {}
+
+        # Single event loop reused for all Telegram sends, so the bot's HTTPX
+        # connection pool stays warm instead of being rebuilt per message
+        self._loop = asyncio.new_event_loop()
+        # All notifications target a single chat, where Telegram's flood
+        # control allows roughly 1 msg/s — pace sends rather than just
+        # capping concurrency
+        self._send_semaphore = asyncio.Semaphore(1)
+        self._send_delay = 1.0  # seconds held between sends
         
         # Initialize Telegram bot if credentials are provided
         bot_token = self.telegram_config.get("bot_token")
@@ -53,121 +138,354 @@ class HFTracker:
         else:
             logger.warning("Telegram bot token not configured. Notifications will be disabled.")
         
-        # Load or initialize state
+        # State lives in SQLite so each cycle writes only the changed rows;
+        # WAL keeps the writes crash-safe. check_same_thread is off because
+        # continuous mode runs cycles on an executor thread (writes are still
+        # serialized — one cycle at a time, merged on a single thread).
+        self.state_db_file = self.state_file.with_suffix(".db")
+        self.db = sqlite3.connect(self.state_db_file, isolation_level=None,
+                                  check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self._init_db()
         self.state = self._load_state()
-    
+        self._cycles_since_flush = 0
+
+    def _init_db(self):
+        """Create the state tables if they don't exist yet."""
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS models ("
+            "  user TEXT NOT NULL,"
+            "  id TEXT NOT NULL,"
+            "  info TEXT NOT NULL,"
+            "  PRIMARY KEY (user, id)"
+            ")"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "  user TEXT PRIMARY KEY,"
+            "  last_checked TEXT,"
+            "  model_count INTEGER,"
+            "  etag TEXT,"
+            "  revision TEXT"
+            ")"
+        )
+
     def _load_state(self) -> Dict:
-        """Load previous tracking state from file."""
-        if self.state_file.exists():
+        """Load tracking state from the SQLite database."""
+        self._migrate_legacy_state()
+
+        state = {}
+        for user, last_checked, model_count, etag, revision in self.db.execute(
+                "SELECT user, last_checked, model_count, etag, revision FROM users"):
+            state[user] = {
+                "models": {},
+                "last_checked": last_checked,
+                "model_count": model_count,
+                "etag": etag,
+                "revision": revision,
+            }
+        for user, model_id, info in self.db.execute("SELECT user, id, info FROM models"):
+            state.setdefault(user, {"models": {}})["models"][model_id] = orjson.loads(info)
+
+        if state:
+            logger.info(f"Loaded state for {len(state)} users from {self.state_db_file}")
+        else:
+            logger.info("No existing state found. Starting fresh.")
+        return state
+
+    def _migrate_legacy_state(self):
+        """One-time import of the old JSON snapshot (plus delta log) into SQLite."""
+        if not self.state_file.exists():
+            return
+        if self.db.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            return  # database already populated
+
+        state = {}
+        try:
+            with open(self.state_file, 'rb') as f:
+                if ijson is not None:
+                    # Stream user entries one at a time so peak memory is
+                    # bounded by the largest user, not the whole file
+                    for username, user_state in ijson.kvitems(f, ""):
+                        state[username] = user_state
+                else:
+                    state = orjson.loads(f.read())
+        except Exception as e:
+            logger.error(f"Error reading legacy state file: {e}")
+            return
+
+        # Replay any deltas appended after the last snapshot
+        legacy_log = self.state_file.with_suffix(".jsonl")
+        if legacy_log.exists():
             try:
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
-                logger.info(f"Loaded state from {self.state_file}")
-                return state
+                with open(legacy_log, 'rb') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        delta = orjson.loads(line)
+                        user_state = state.setdefault(delta["user"], {"models": {}})
+                        if "meta" in delta:
+                            user_state.update(delta["meta"])
+                        elif delta.get("deleted"):
+                            user_state.setdefault("models", {}).pop(delta["model_id"], None)
+                        else:
+                            user_state.setdefault("models", {})[delta["model_id"]] = delta["info"]
             except Exception as e:
-                logger.error(f"Error loading state: {e}")
-                return {}
-        else:
-            logger.info("No existing state file found. Starting fresh.")
-            return {}
-    
-    def _save_state(self):
-        """Save current tracking state to file."""
+                logger.error(f"Error replaying legacy state log: {e}")
+
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(self.state, f, indent=2)
-            logger.debug(f"State saved to {self.state_file}")
+            self.db.execute("BEGIN")
+            for username, user_state in state.items():
+                self.db.execute(
+                    "INSERT OR REPLACE INTO users (user, last_checked, model_count, etag, revision) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (username, user_state.get("last_checked"), user_state.get("model_count"),
+                     user_state.get("etag"), user_state.get("revision"))
+                )
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO models (user, id, info) VALUES (?, ?, ?)",
+                    [(username, model_id, orjson.dumps(info).decode())
+                     for model_id, info in user_state.get("models", {}).items()]
+                )
+            self.db.execute("COMMIT")
         except Exception as e:
-            logger.error(f"Error saving state: {e}")
-    
-    def _get_user_models(self, username: str) -> List[ModelInfo]:
-        """Fetch all models for a given user."""
+            self.db.execute("ROLLBACK")
+            logger.error(f"Error migrating legacy state: {e}")
+            return
+
+        # Keep the old files out of the way but recoverable
+        os.replace(self.state_file, self.state_file.with_suffix(self.state_file.suffix + ".bak"))
+        if legacy_log.exists():
+            os.replace(legacy_log, legacy_log.with_suffix(legacy_log.suffix + ".bak"))
+        logger.info(f"Migrated legacy JSON state into {self.state_db_file}")
+
+    def _append_state_deltas(self, deltas: List[Dict]):
+        """Write this cycle's changed rows to SQLite in a single transaction."""
+        if not deltas:
+            return
+        model_rows = []
+        deleted_rows = []
+        meta_rows = []
+        for delta in deltas:
+            if "meta" in delta:
+                meta = delta["meta"]
+                meta_rows.append((delta["user"], meta.get("last_checked"),
+                                  meta.get("model_count"), meta.get("etag"),
+                                  meta.get("revision")))
+            elif delta.get("deleted"):
+                deleted_rows.append((delta["user"], delta["model_id"]))
+            else:
+                model_rows.append((delta["user"], delta["model_id"],
+                                   orjson.dumps(delta["info"]).decode()))
         try:
-            models = list(self.hf_api.list_models(author=username))
-            # Sort by last_modified (most recent first) if available
-            def get_sort_key(m):
-                if hasattr(m, 'last_modified') and m.last_modified:
-                    return m.last_modified
-                elif hasattr(m, 'updated_at') and m.updated_at:
-                    return m.updated_at
-                elif hasattr(m, 'created_at') and m.created_at:
-                    return m.created_at
-                else:
-                    return datetime.min.replace(tzinfo=timezone.utc)
-            models.sort(key=get_sort_key, reverse=True)
-            return models
+            self.db.execute("BEGIN")
+            self.db.executemany(
+                "INSERT INTO models (user, id, info) VALUES (?, ?, ?) "
+                "ON CONFLICT (user, id) DO UPDATE SET info = excluded.info",
+                model_rows
+            )
+            self.db.executemany("DELETE FROM models WHERE user = ? AND id = ?", deleted_rows)
+            self.db.executemany(
+                "INSERT INTO users (user, last_checked, model_count, etag, revision) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user) DO UPDATE SET"
+                "  last_checked = excluded.last_checked,"
+                "  model_count = COALESCE(excluded.model_count, users.model_count),"
+                "  etag = COALESCE(excluded.etag, users.etag),"
+                "  revision = COALESCE(excluded.revision, users.revision)",
+                meta_rows
+            )
+            self.db.execute("COMMIT")
+        except Exception as e:
+            self.db.execute("ROLLBACK")
+            logger.error(f"Error saving state deltas: {e}")
+
+    def _get_user_models(self, username: str, etag: Optional[str] = None) -> tuple:
+        """Fetch all models for a given user, including SHA, in a single request.
+
+        Sends a conditional GET with ``If-None-Match`` when a previous ETag is
+        known. Returns a (models, etag) tuple; models is None when the Hub
+        answers 304 Not Modified, meaning nothing changed since the last poll.
+        """
+        try:
+            headers = {}
+            if etag:
+                headers["If-None-Match"] = etag
+            if self.hf_token:
+                headers["Authorization"] = f"Bearer {self.hf_token}"
+            response = self._session.get(
+                "https://huggingface.co/api/models",
+                params={"author": username, "full": "true"},
+                headers=headers,
+                timeout=30,
+            )
+            if response.status_code == 304:
+                logger.debug(f"Model listing for {username} unchanged (304)")
+                return None, etag
+            response.raise_for_status()
+            # The ETag covers the first page; on 200, follow the Link header
+            # so authors with more models than one page aren't truncated
+            new_etag = response.headers.get("ETag")
+            models = [ModelInfo(**item) for item in response.json()]
+            page_headers = {k: v for k, v in headers.items() if k != "If-None-Match"}
+            next_url = response.links.get("next", {}).get("url")
+            while next_url:
+                response = self._session.get(next_url, headers=page_headers, timeout=30)
+                response.raise_for_status()
+                models.extend(ModelInfo(**item) for item in response.json())
+                next_url = response.links.get("next", {}).get("url")
+            return models, new_etag
+        except Exception as e:
+            logger.warning(f"Conditional listing failed for {username}, falling back to HfApi: {e}")
+
+        try:
+            # HfApi fallback keeps auth/token plumbing working; request the
+            # fields we diff on (sha in particular) directly in the listing so
+            # we don't need a per-model model_info() round-trip.
+            try:
+                models = list(self.hf_api.list_models(
+                    author=username,
+                    expand=["sha", "lastModified", "downloads", "tags", "createdAt", "author"]
+                ))
+            except TypeError:
+                # Older huggingface_hub without `expand` support
+                models = list(self.hf_api.list_models(author=username, full=True))
+            # No sorting: consumers treat the listing as an unordered
+            # collection, and notifications are ordered in check_all_users
+            return models, None
         except Exception as e:
             logger.error(f"Error fetching models for user {username}: {e}")
-            return []
+            return [], None
     
     def _get_model_info(self, model_id: str) -> Optional[ModelInfo]:
-        """Get detailed information about a specific model."""
+        """Get detailed information about a specific model (TTL-cached)."""
+        cached = self._minfo_cache.get(model_id)
+        if cached and (time.monotonic() - cached[0]) < self._minfo_cache_ttl:
+            return cached[1]
         try:
-            return self.hf_api.model_info(model_id)
+            info = self.hf_api.model_info(model_id)
+            self._minfo_cache[model_id] = (time.monotonic(), info)
+            return info
         except Exception as e:
             logger.error(f"Error fetching model info for {model_id}: {e}")
             return None
     
+    def _intern_timestamp(self, dt) -> Optional[str]:
+        """ISO-format a datetime, deduping equal strings through the intern table."""
+        if not dt:
+            return None
+        s = dt.isoformat()
+        return self._ts_intern.setdefault(s, s)
+
     def _format_model_info(self, model: ModelInfo) -> Dict:
         """Extract relevant information from a model."""
+        model_id, author, created_at, last_modified, sha, tags, downloads = _MI_GET(model)
+        # updated_at only exists on older huggingface_hub ModelInfo objects
+        updated_at = getattr(model, 'updated_at', None)
         return {
-            "id": model.id,
-            "author": getattr(model, 'author', None),
-            "created_at": model.created_at.isoformat() if hasattr(model, 'created_at') and model.created_at else None,
-            "updated_at": model.updated_at.isoformat() if hasattr(model, 'updated_at') and model.updated_at else None,
-            "last_modified": model.last_modified.isoformat() if hasattr(model, 'last_modified') and model.last_modified else None,
-            "sha": getattr(model, 'sha', None),
-            "tags": getattr(model, 'tags', []) or [],
-            "downloads": getattr(model, 'downloads', 0),
+            # Ids recur every cycle, so keep one canonical string object
+            "id": sys.intern(model_id),
+            "author": author,
+            "created_at": self._intern_timestamp(created_at),
+            "updated_at": self._intern_timestamp(updated_at),
+            "last_modified": self._intern_timestamp(last_modified),
+            "sha": sha,
+            "tags": tags or [],
+            "downloads": downloads or 0,
         }
     
-    def _check_user_updates(self, username: str) -> List[Dict]:
-        """Check for updates in a user's models and return list of changes."""
+    @staticmethod
+    def _compute_revision(models: List[ModelInfo]) -> str:
+        """Hash a user's (id, sha, last_modified) stream into a short revision."""
+        h = hashlib.blake2b(digest_size=16)
+        for model in sorted(models, key=operator.attrgetter("id")):
+            h.update(model.id.encode())
+            h.update(b"\0")
+            h.update((getattr(model, 'sha', None) or "").encode())
+            h.update(b"\0")
+            last_modified = getattr(model, 'last_modified', None)
+            h.update(last_modified.isoformat().encode() if last_modified else b"")
+            h.update(b"\n")
+        return h.hexdigest()
+
+    def _check_user_updates(self, username: str) -> tuple:
+        """Check for updates in a user's models.
+
+        Returns a (user_state, updates, deltas) tuple. The top-level
+        ``self.state`` mapping is only written by the caller on the main
+        thread; this worker touches just its own user's live models dict,
+        and only after the diff has completed without error. ``deltas``
+        holds the records for rows that changed this cycle.
+        """
         updates = []
+        deltas = []
         logger.info(f"Checking updates for user: {username}")
-        
-        # Get current models (basic list)
-        current_models = self._get_user_models(username)
-        current_model_ids = {model.id for model in current_models}
-        
+
         # Get previous state for this user
         previous_state = self.state.get(username, {})
         previous_models = previous_state.get("models", {})
         previous_model_ids = set(previous_models.keys())
-        
-        # Fetch detailed info for all current models to get SHA and track commits
-        current_model_dict = {}
+
+        # Conditional fetch: a 304 means nothing changed, so skip the whole diff
+        current_models, etag = self._get_user_models(username, previous_state.get("etag"))
+        if current_models is None:
+            user_state = dict(previous_state)
+            user_state["last_checked"] = datetime.now().isoformat()
+            deltas.append({"user": username, "meta": {"last_checked": user_state["last_checked"]}})
+            return user_state, [], deltas
+
+        # Cheap whole-user short-circuit: hash the (id, sha, last_modified)
+        # stream and compare against the stored revision; identical means the
+        # per-model diff below can't produce anything
+        revision = self._compute_revision(current_models)
+        if revision == previous_state.get("revision"):
+            user_state = dict(previous_state)
+            user_state["last_checked"] = datetime.now().isoformat()
+            user_state["etag"] = etag
+            deltas.append({"user": username, "meta": {
+                "last_checked": user_state["last_checked"], "etag": etag
+            }})
+            return user_state, [], deltas
+
+        # Single pass: unchanged models (the common case) short-circuit on a
+        # (sha, last_modified) comparison, only changed rows are re-formatted.
+        # Changes accumulate in a local dict and are applied to the live
+        # per-user dict only after the whole diff has succeeded, so a failure
+        # mid-loop can't leave state patched without its updates/deltas.
+        changed_entries = {}
+        current_model_ids = set()
         for model in current_models:
             model_id = model.id
-            # Fetch detailed model info to get SHA for commit tracking
-            detailed_info = self._get_model_info(model_id)
-            if detailed_info:
-                current_model_dict[model_id] = self._format_model_info(detailed_info)
-            else:
-                # Fallback to basic info if detailed fetch fails
-                current_model_dict[model_id] = self._format_model_info(model)
-        
-        # Check for new models
-        new_model_ids = current_model_ids - previous_model_ids
-        for model_id in new_model_ids:
-            updates.append({
-                "type": "new_model",
-                "user": username,
-                "model_id": model_id,
-                "model_info": current_model_dict.get(model_id, {})
-            })
-            logger.info(f"New model detected: {model_id}")
-        
-        # Check for updates in existing models (SHA changes indicate new commits)
-        existing_model_ids = current_model_ids & previous_model_ids
-        for model_id in existing_model_ids:
-            current_info = current_model_dict.get(model_id, {})
-            previous_info = previous_models.get(model_id, {})
-            
-            # Check if SHA changed (indicates new commit)
-            current_sha = current_info.get("sha")
+            current_model_ids.add(model_id)
+            previous_info = previous_models.get(model_id)
+
+            current_sha = getattr(model, 'sha', None)
+            last_modified = model.last_modified.isoformat() \
+                if getattr(model, 'last_modified', None) else None
+
+            if previous_info is not None \
+                    and previous_info.get("sha") == current_sha \
+                    and previous_info.get("last_modified") == last_modified:
+                continue
+
+            current_info = self._format_model_info(model)
+            changed_entries[model_id] = current_info
+
+            if previous_info is None:
+                updates.append({
+                    "type": "new_model",
+                    "user": username,
+                    "model_id": model_id,
+                    "model_info": current_info
+                })
+                deltas.append({"user": username, "model_id": model_id, "info": current_info})
+                logger.info(f"New model detected: {model_id}")
+                continue
+
+            # SHA change indicates a new commit
             previous_sha = previous_info.get("sha")
-            
             if current_sha and previous_sha and current_sha != previous_sha:
                 updates.append({
                     "type": "model_updated",
@@ -177,100 +495,113 @@ class HFTracker:
                     "current_sha": current_sha,
                     "model_info": current_info
                 })
+                deltas.append({"user": username, "model_id": model_id, "info": current_info})
+                # Invalidate on change so the next detail fetch sees the new commit
+                self._minfo_cache.pop(model_id, None)
                 logger.info(f"Model updated: {model_id} (SHA changed: {previous_sha[:8]} -> {current_sha[:8]})")
-            
-            # Also check if last_modified changed (fallback if SHA not available)
-            elif current_info.get("last_modified") != previous_info.get("last_modified"):
+
+            # last_modified change is the fallback when SHA is unavailable
+            elif last_modified != previous_info.get("last_modified"):
                 updates.append({
                     "type": "model_updated",
                     "user": username,
                     "model_id": model_id,
                     "previous_modified": previous_info.get("last_modified"),
-                    "current_modified": current_info.get("last_modified"),
+                    "current_modified": last_modified,
                     "model_info": current_info
                 })
+                deltas.append({"user": username, "model_id": model_id, "info": current_info})
                 logger.info(f"Model updated: {model_id} (last_modified changed)")
-        
-        # Update state for this user
-        self.state[username] = {
+
+        stale_ids = previous_model_ids - current_model_ids
+        for model_id in stale_ids:
+            deltas.append({"user": username, "model_id": model_id, "deleted": True})
+
+        # The diff completed; now patch the live dict in place so each cycle
+        # still allocates O(changed) entries instead of rebuilding O(total)
+        current_model_dict = previous_models
+        current_model_dict.update(changed_entries)
+        for model_id in stale_ids:
+            current_model_dict.pop(model_id, None)
+
+        # New state for this user; merged into self.state by the caller
+        user_state = {
             "models": current_model_dict,
             "last_checked": datetime.now().isoformat(),
-            "model_count": len(current_model_dict)
+            "model_count": len(current_model_dict),
+            "etag": etag,
+            "revision": revision
         }
-        
-        return updates
+        deltas.append({"user": username, "meta": {
+            "last_checked": user_state["last_checked"],
+            "model_count": user_state["model_count"],
+            "etag": etag,
+            "revision": revision
+        }})
+
+        return user_state, updates, deltas
     
-    def _send_telegram_notification(self, message: str):
-        """Send a notification to Telegram channel."""
-        bot_token = self.telegram_config.get("bot_token")
-        if not bot_token or bot_token == "YOUR_TELEGRAM_BOT_TOKEN":
-            logger.warning("Telegram bot token not configured. Skipping notification.")
+    def _send_telegram_notifications(self, messages: List[str]):
+        """Send a batch of notifications to the Telegram channel."""
+        if self.telegram_bot is None:
+            logger.warning("Telegram bot token not configured. Skipping notifications.")
             return
-        
+
         channel_id = self.telegram_config.get("channel_id")
         if not channel_id or channel_id == "YOUR_TELEGRAM_CHANNEL_ID":
-            logger.warning("Telegram channel ID not configured. Skipping notification.")
+            logger.warning("Telegram channel ID not configured. Skipping notifications.")
             return
-        
+
+        # Ensure channel_id has the format Telegram expects (@channelname or -1001234567890)
+        if isinstance(channel_id, int) or (isinstance(channel_id, str) and channel_id.lstrip('-').isdigit()):
+            channel_id = int(channel_id)
+
         try:
-            # Ensure channel_id is a string (Telegram API expects @channelname or -1001234567890 format)
-            if isinstance(channel_id, int) or (isinstance(channel_id, str) and channel_id.lstrip('-').isdigit()):
-                channel_id = int(channel_id)
-            
-            # Always use threading approach to avoid event loop conflicts
-            # Create a new Bot instance in each thread with its own event loop
-            result_queue = queue.Queue()
-            
-            def run_in_thread():
-                """Run async send in a new thread with its own event loop."""
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
-                bot = None
-                try:
-                    # Create a new Bot instance in this thread's event loop
-                    bot = Bot(token=bot_token)
-                    new_loop.run_until_complete(self._async_send_message(bot, channel_id, message))
-                    result_queue.put(True)
-                except Exception as e:
-                    result_queue.put(e)
-                finally:
-                    # Clean up
-                    if bot:
-                        try:
-                            new_loop.run_until_complete(bot.close())
-                        except:
-                            pass
-                    new_loop.close()
-            
-            thread = threading.Thread(target=run_in_thread, daemon=False)
-            thread.start()
-            thread.join(timeout=30)  # 30 second timeout
-            
-            if thread.is_alive():
-                logger.error("Telegram notification timed out")
+            # All sends share the persistent loop and bot session; the
+            # semaphore keeps concurrent requests under Telegram's rate limit.
+            # When the loop is already running (continuous mode drives the
+            # checks from a worker thread), hop onto it thread-safely.
+            coro = self._send_message_batch(channel_id, messages)
+            if self._loop.is_running():
+                asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout=120)
             else:
-                result = result_queue.get_nowait() if not result_queue.empty() else None
-                if isinstance(result, Exception):
-                    raise result
-        except queue.Empty:
-            logger.error("Telegram notification failed: no result returned")
+                self._loop.run_until_complete(coro)
         except TelegramError as e:
             logger.error(f"Failed to send Telegram notification: {e}")
         except Exception as e:
-            logger.error(f"Unexpected error sending Telegram notification: {e}")
-    
-    async def _async_send_message(self, bot: Bot, channel_id: int, message: str):
-        """Async helper to send Telegram message."""
-        try:
-            await bot.send_message(
-                chat_id=channel_id,
-                text=message,
-                parse_mode='HTML'
-            )
-            logger.info("Telegram notification sent successfully")
-        except Exception as e:
-            logger.error(f"Error in async send_message: {e}")
-            raise
+            logger.error(f"Unexpected error sending Telegram notifications: {e}")
+
+    async def _send_message_batch(self, channel_id: int, messages: List[str]):
+        """Send a batch of messages on the persistent loop.
+
+        Failures are captured per message so one rejected send can't abandon
+        the rest of the batch.
+        """
+        results = await asyncio.gather(
+            *(self._async_send_message(channel_id, m) for m in messages),
+            return_exceptions=True
+        )
+        failed = sum(1 for r in results if isinstance(r, Exception))
+        if failed:
+            logger.error(f"{failed}/{len(results)} Telegram notifications failed")
+
+    async def _async_send_message(self, channel_id: int, message: str):
+        """Async helper to send a Telegram message under the rate-limit semaphore."""
+        async with self._send_semaphore:
+            try:
+                await self.telegram_bot.send_message(
+                    chat_id=channel_id,
+                    text=message,
+                    parse_mode='HTML'
+                )
+                logger.info("Telegram notification sent successfully")
+            except Exception as e:
+                logger.error(f"Error in async send_message: {e}")
+                raise
+            finally:
+                # Hold the semaphore through the delay so sends are paced,
+                # not merely bounded in concurrency
+                await asyncio.sleep(self._send_delay)
     
     def _format_date(self, date_str: Optional[str]) -> str:
         """Format ISO date string to a readable format."""
@@ -290,50 +621,73 @@ class HFTracker:
         username = update.get("user")
         model_id = update.get("model_id")
         model_info = update.get("model_info", {})
-        
-        model_url = f"https://huggingface.co/{model_id}"
-        last_modified = self._format_date(model_info.get('last_modified'))
-        
+
+        # Escape user-controlled fields so model ids/tags can't break the
+        # HTML; the URL sits in an attribute, so quotes must be escaped too
+        fields = {
+            "user": html.escape(str(username)),
+            "model_id": html.escape(str(model_id)),
+            "url": html.escape(f"https://huggingface.co/{model_id}", quote=True),
+            "last_modified": self._format_date(model_info.get('last_modified')),
+        }
+
         if update_type == "new_model":
             tags = model_info.get("tags", [])
-            tags_str = ", ".join(tags[:5]) if tags else "No tags"
-            
-            message = (
-                f"🆕 <b>New Model Detected!</b>\n\n"
-                f"👤 User: <b>{username}</b>\n"
-                f"📦 Model: <b>{model_id}</b>\n"
-                f"🏷️ Tags: {tags_str}\n"
-                f"📥 Downloads: {model_info.get('downloads', 0):,}\n"
-                f"📅 Last Modified: {last_modified}\n"
-                f"🔗 <a href='{model_url}'>View on Hugging Face</a>"
-            )
+            fields["tags"] = html.escape(", ".join(tags[:5])) if tags else "No tags"
+            fields["downloads"] = model_info.get('downloads', 0)
+            return _TPL_NEW.format_map(fields)
         elif update_type == "model_updated":
-            message = (
-                f"🔄 <b>Model Updated!</b>\n\n"
-                f"👤 User: <b>{username}</b>\n"
-                f"📦 Model: <b>{model_id}</b>\n"
-                f"📅 Last Modified: {last_modified}\n"
-                f"🔗 <a href='{model_url}'>View on Hugging Face</a>"
-            )
+            return _TPL_UPDATED.format_map(fields)
         else:
-            message = f"Update detected for {model_id} by {username}"
-        
-        return message
+            return f"Update detected for {model_id} by {username}"
     
+    def _pack_messages(self, updates: List[Dict]) -> List[str]:
+        """Pack formatted updates into as few Telegram messages as possible.
+
+        Greedily concatenates updates separated by a divider, flushing a chunk
+        before it would exceed Telegram's 4096-character message limit.
+        """
+        chunks = []
+        current = ""
+        for update in updates:
+            part = self._format_update_message(update)
+            if current and len(current) + len(part) + len("\n\n───\n\n") > 3800:
+                chunks.append(current)
+                current = part
+            else:
+                current = current + "\n\n───\n\n" + part if current else part
+        if current:
+            chunks.append(current)
+        return chunks
+
     def check_all_users(self):
         """Check all configured users for updates."""
         logger.info(f"Starting check for {len(self.hf_users)} users...")
         all_updates = []
-        
-        for username in self.hf_users:
-            try:
-                updates = self._check_user_updates(username)
-                all_updates.extend(updates)
-            except Exception as e:
-                logger.error(f"Error checking user {username}: {e}")
-        
-        # Save state after checking all users
-        self._save_state()
+        all_deltas = []
+
+        # User checks are independent HTTP calls, so run them concurrently.
+        # Workers don't touch self.state; results are merged here on the main
+        # thread, which avoids any locking.
+        with ThreadPoolExecutor(max_workers=min(16, max(1, len(self.hf_users)))) as executor:
+            futures = {executor.submit(self._check_user_updates, u): u for u in self.hf_users}
+            for future in as_completed(futures):
+                username = futures[future]
+                try:
+                    user_state, updates, deltas = future.result()
+                    self.state[username] = user_state
+                    all_updates.extend(updates)
+                    all_deltas.extend(deltas)
+                except Exception as e:
+                    logger.error(f"Error checking user {username}: {e}")
+
+        # Persist only this cycle's changed rows
+        self._append_state_deltas(all_deltas)
+        self._cycles_since_flush += 1
+        if self._cycles_since_flush >= 100:
+            # Flush the intern table so stale timestamps don't accumulate
+            self._ts_intern.clear()
+            self._cycles_since_flush = 0
         
         # Send notifications for all updates
         if all_updates:
@@ -351,12 +705,10 @@ class HFTracker:
                 return 0
             
             sorted_updates = sorted(all_updates, key=get_sort_key)
-            
-            for update in sorted_updates:
-                message = self._format_update_message(update)
-                self._send_telegram_notification(message)
-                # Small delay between notifications to avoid rate limiting
-                time.sleep(1)
+
+            # Batch updates into a few messages rather than one per update
+            messages = self._pack_messages(sorted_updates)
+            self._send_telegram_notifications(messages)
         else:
             logger.info("No updates detected.")
         
@@ -365,22 +717,44 @@ class HFTracker:
     def run_continuous(self):
         """Run the tracker continuously with the configured interval."""
         logger.info(f"Starting continuous tracking (interval: {self.check_interval/60:.1f} minutes)")
-        
-        # Initial check
-        self.check_all_users()
-        
-        # Continuous loop
-        while True:
+        try:
+            self._loop.run_until_complete(self._run_continuous())
+        except KeyboardInterrupt:
+            logger.info("Tracker stopped by user")
+
+    async def _run_continuous(self):
+        """Async scheduler: check on absolute monotonic deadlines, stop on signal."""
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
             try:
-                logger.info(f"Waiting {self.check_interval/60:.1f} minutes until next check...")
-                time.sleep(self.check_interval)
-                self.check_all_users()
-            except KeyboardInterrupt:
-                logger.info("Tracker stopped by user")
-                break
+                self._loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                # Signal handlers aren't available on this platform (Windows)
+                pass
+
+        # Absolute deadlines keep checks at T, 2T, 3T... with no drift from
+        # however long each check itself takes
+        next_deadline = time.monotonic()
+        while not stop.is_set():
+            try:
+                # Checks block on HTTP, so run them off-loop; notification
+                # sends hop back onto this loop thread-safely
+                await self._loop.run_in_executor(None, self.check_all_users)
             except Exception as e:
                 logger.error(f"Error in continuous loop: {e}")
-                time.sleep(60)  # Wait 1 minute before retrying on error
+
+            next_deadline += self.check_interval
+            delay = next_deadline - time.monotonic()
+            if delay <= 0:
+                # Fell behind (check took longer than the interval); re-anchor
+                next_deadline = time.monotonic()
+                delay = 0
+            logger.info(f"Waiting {delay/60:.1f} minutes until next check...")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Tracker stopped by signal")
 
 
 def main():